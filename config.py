@@ -1,2 +1,10 @@
+import os
+
 VOSK_MODEL_URL = "https://alphacephei.com/vosk/models/vosk-model-ru-0.22.zip"
-MODEL_DIR = "vosk-model"
\ No newline at end of file
+MODEL_DIR = "vosk-model"
+# SHA-256 архива модели; None — без проверки
+VOSK_MODEL_SHA256 = os.environ.get("AVE_MODEL_SHA256") or None
+# Общий каталог-кеш архивов (например, сетевой диск), чтобы модель скачивалась один раз на парк машин
+MODEL_CACHE_DIR = os.environ.get("AVE_MODEL_CACHE_DIR") or None
+# Число параллельных соединений при скачивании
+DOWNLOAD_CONNECTIONS = int(os.environ.get("AVE_DOWNLOAD_CONNECTIONS", "4"))
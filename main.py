@@ -3,8 +3,7 @@
 from __future__ import annotations
 
 import argparse
-
-from src.pipeline import run_pipeline
+import os
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -16,12 +15,69 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--model-path", default="vosk-model", help="Путь к модели Vosk")
     p.add_argument("--sample-rate", type=int, default=16000, help="Частота дискретизации для распознавания")
     p.add_argument("--no-interactive", action="store_true", help="Не спрашивать, какие сегменты удалять")
+    p.add_argument(
+        "--drop-retakes",
+        action="store_true",
+        help="Удалять повторные дубли фраз автоматически (в интерактиве они предлагаются всегда)",
+    )
     p.add_argument("--configure-crop", action="store_true", help="Интерактивная настройка области кропа")
+    p.add_argument(
+        "--export-mode",
+        choices=("video", "audio", "still"),
+        default="video",
+        help="video — полный рендер; audio — только обрезанный звук; still — звук на статичном кадре",
+    )
+    p.add_argument("--render-cache", metavar="DIR", help="Каталог кеша закодированных фрагментов для повторного экспорта")
+    p.add_argument("--render-cache-size", type=float, default=10.0, help="Предельный размер кеша рендера, ГБ")
+    p.add_argument(
+        "--server",
+        metavar="URL",
+        help="Выполнить на запущенном сервере задач (python -m src.app.server), без интерактива",
+    )
     return p
 
 
+def run_on_server(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    from src.app.client import JobFailedError, run_remote
+
+    def on_event(event: dict) -> None:
+        if event["event"] == "progress":
+            print(event["message"])
+
+    params = dict(
+        output_path=args.output,
+        silence_threshold_db=args.threshold,
+        min_silence_ms=args.min_silence,
+        sample_rate=args.sample_rate,
+        export_mode=args.export_mode,
+        drop_retakes=args.drop_retakes,
+    )
+    if args.render_cache:
+        params["render_cache_dir"] = os.path.abspath(args.render_cache)
+        params["render_cache_max_bytes"] = int(args.render_cache_size * 1024 ** 3)
+    # Модель по умолчанию сервер уже держит в памяти — передаём путь, только если он задан явно
+    if args.model_path != parser.get_default("model_path"):
+        params["model_path"] = os.path.abspath(args.model_path)
+
+    try:
+        output = run_remote(args.server, args.input, on_event=on_event, **params)
+    except JobFailedError as e:
+        raise SystemExit(f"Ошибка: {e}")
+    print(f"Готово: {output}")
+
+
 def main() -> None:
-    args = build_parser().parse_args()
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.server:
+        if args.configure_crop:
+            parser.error("--configure-crop недоступен при работе через --server")
+        run_on_server(args, parser)
+        return
+
+    # Импорт тяжёлых зависимостей только для локального запуска
+    from src.pipeline import run_pipeline
 
     run_pipeline(
         input_path=args.input,
@@ -32,6 +88,10 @@ def main() -> None:
         sample_rate=args.sample_rate,
         interactive=not args.no_interactive,
         configure_crop=args.configure_crop,
+        render_cache_dir=args.render_cache,
+        render_cache_max_bytes=int(args.render_cache_size * 1024 ** 3),
+        export_mode=args.export_mode,
+        drop_retakes=args.drop_retakes,
     )
 
 
@@ -0,0 +1,69 @@
+"""Тонкий клиент сервера задач (см. src.app.server)."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator, Optional
+import json
+import os
+import urllib.error
+import urllib.request
+
+
+class JobFailedError(RuntimeError):
+    pass
+
+
+def submit_job(server_url: str, input_path: str, timeout: float = 30.0, **params: Any) -> str:
+    """Отправить задачу на сервер и вернуть её идентификатор.
+
+    Пути приводятся к абсолютным: сервер может работать в другом каталоге.
+    """
+    payload: Dict[str, Any] = {"input_path": os.path.abspath(input_path)}
+    for key, value in params.items():
+        if key == "output_path" and value is not None:
+            value = os.path.abspath(value)
+        payload[key] = value
+
+    req = urllib.request.Request(
+        server_url.rstrip("/") + "/jobs",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())["job_id"]
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get("error", e.reason)
+        except Exception:
+            message = e.reason
+        raise JobFailedError(f"Сервер отклонил задачу ({e.code}): {message}") from None
+
+
+def iter_events(server_url: str, job_id: str) -> Iterator[Dict[str, Any]]:
+    """Поток событий задачи до её завершения."""
+    url = f"{server_url.rstrip('/')}/jobs/{job_id}/events"
+    with urllib.request.urlopen(url) as resp:
+        for line in resp:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def run_remote(
+    server_url: str,
+    input_path: str,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    **params: Any,
+) -> str:
+    """Выполнить задачу на сервере, дождаться завершения и вернуть путь к результату."""
+    job_id = submit_job(server_url, input_path, **params)
+    for event in iter_events(server_url, job_id):
+        if on_event is not None:
+            on_event(event)
+        if event["event"] == "done":
+            return event["output_path"]
+        if event["event"] == "failed":
+            raise JobFailedError(event.get("error") or "задача завершилась с ошибкой")
+    raise JobFailedError("соединение с сервером закрыто до завершения задачи")
@@ -1,16 +1,31 @@
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
+from typing import Any, List, Tuple, Optional
+from pathlib import Path
 import logging
+import tempfile
 
+import numpy as np
 from moviepy import VideoFileClip
 
 from src.domain.entities import TranscriptSegment
-from src.services.audio_service import find_silence, get_non_silences
+from src.domain.segment_array import SegmentArray
+from src.services.audio_service import find_silence, find_silence_pcm, get_non_silences
 from src.services.stt_service import VoskSttService
-from src.services.video_service import split_to_clips, speed_up_segment, concat
+from src.services.video_service import CLIP_PADDING, clip_ranges, split_to_clips, speed_up_segment, concat
 from src.services.layout_service import compose_vertical
 from src.services.preview_service import configure_crop_interactive, get_default_crop_for_vertical
+from src.services.render_cache import RenderCache, concat_chunks, source_fingerprint
+from src.services.audio_export import cut_to_lengths, decode_audio, encode_audio, iter_with_crossfade
+from src.services.retake_service import find_retakes
+
+# Параметры кодирования фрагментов: одинаковые у всех, иначе склейка без перекодирования невозможна
+RENDER_CODEC = "libx264"
+RENDER_PRESET = "medium"
+
+# video — полный рендер; audio — только обрезанный звук; still — звук на одном статичном кадре
+EXPORT_MODES = ("video", "audio", "still")
+AUDIO_EXPORT_SAMPLE_RATE = 44100
 
 
 def run_pipeline(
@@ -27,7 +42,14 @@ def run_pipeline(
     out_size: Tuple[int, int] = (1080, 1920),
     crop_box: Optional[Tuple[int, int, int, int]] = None,
     scale: float = 1.25,
+    render_cache_dir: Optional[str] = None,
+    render_cache_max_bytes: int = 10 * 1024 ** 3,
+    export_mode: str = "video",
+    drop_retakes: bool = False,
 ) -> None:
+    if export_mode not in EXPORT_MODES:
+        raise ValueError(f"Неизвестный режим экспорта: {export_mode!r} (ожидается один из {', '.join(EXPORT_MODES)})")
+
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
     logger = logging.getLogger(__name__)
 
@@ -45,17 +67,47 @@ def run_pipeline(
             # Автоматический кроп для вертикального видео
             final_crop_box = get_default_crop_for_vertical(video.w, video.h)
             logger.info("Авто-кроп для вертикального видео: %s", final_crop_box)
-        logger.info("Детекция тишины...")
-        silences = find_silence(video, silence_threshold_db, min_silence_ms)
+        samples = None
+        if export_mode != "video":
+            # Звук декодируется один раз: по нему ищется тишина и из него же режется результат
+            if getattr(video, "audio", None) is None:
+                raise ValueError(f"В {input_path} нет звуковой дорожки — режим {export_mode!r} невозможен")
+            logger.info("Декодирование звука...")
+            samples = decode_audio(input_path, sample_rate=AUDIO_EXPORT_SAMPLE_RATE, duration=video.duration)
+            logger.info("Детекция тишины...")
+            silences = find_silence_pcm(samples, AUDIO_EXPORT_SAMPLE_RATE, silence_threshold_db, min_silence_ms)
+        else:
+            logger.info("Детекция тишины...")
+            silences = find_silence(video, silence_threshold_db, min_silence_ms)
         logger.info("Тишин найдено: %d", len(silences))
 
         logger.info("Формирование non-silence сегментов...")
         non_silences = get_non_silences(silences, total_duration=video.duration)
+        # Сегменты, чьи клипы с запасом перекрылись бы, сливаем заранее:
+        # меньше клипов на распознавание и рендер, без дублирования звука на стыках.
+        non_silences = non_silences.coalesce(min_gap=2 * CLIP_PADDING)
         logger.info("Сегментов речи: %d", len(non_silences))
 
         if not non_silences:
             logger.warning("Не найдено сегментов речи — экспорт исходника.")
-            video.write_videofile(output_path)
+            if samples is not None:
+                assert final_crop_box is not None
+                _export_audio_first(
+                    video, samples, non_silences, output_path, still=export_mode == "still",
+                    bg_color=bg_color, out_size=out_size, crop_box=final_crop_box, scale=scale,
+                )
+            else:
+                video.write_videofile(output_path)
+            return
+
+        if samples is not None and not (interactive or drop_retakes):
+            # Удалять нечего решать — текст не нужен, распознавание пропускаем
+            logger.info("Экспорт без распознавания текста")
+            assert final_crop_box is not None
+            _export_audio_first(
+                video, samples, non_silences, output_path, still=export_mode == "still",
+                bg_color=bg_color, out_size=out_size, crop_box=final_crop_box, scale=scale,
+            )
             return
 
         logger.info("Нарезка видео по сегментам речи...")
@@ -71,15 +123,34 @@ def run_pipeline(
             transcripts.append(TranscriptSegment(start=non_silences[i].start, end=non_silences[i].end, text=text))
             logger.info("%d. %.2f-%.2f: %s", i + 1, non_silences[i].start, non_silences[i].end, text)
 
+        to_delete: List[int] = []
+        if interactive or drop_retakes:
+            to_delete = find_retakes(transcripts)
+            if to_delete:
+                logger.info("Похожи на повторные дубли: %s", " ".join(str(i + 1) for i in to_delete))
+
         if interactive:
-            print("\nУдалить (номера через пробел, 1..N). Пусто — ничего: ", end="")
+            if to_delete:
+                print("\nУдалить (номера через пробел, 1..N). Пусто — предложенные дубли, 0 — ничего: ", end="")
+            else:
+                print("\nУдалить (номера через пробел, 1..N). Пусто — ничего: ", end="")
             raw = input().strip()
             if raw:
-                indices = sorted({int(x) - 1 for x in raw.split() if x.isdigit()}, reverse=True)
-                for idx in indices:
-                    if 0 <= idx < len(clips):
-                        clips.pop(idx)
-                        non_silences.pop(idx)
+                to_delete = [int(x) - 1 for x in raw.split() if x.isdigit()]
+
+        if to_delete:
+            keep = non_silences.index_mask(to_delete)
+            clips = [clip for clip, k in zip(clips, keep) if k]
+            non_silences = non_silences[keep]
+
+        if samples is not None:
+            # Только звук (или звук на статичном кадре): кадры видео не декодируются вовсе
+            assert final_crop_box is not None
+            _export_audio_first(
+                video, samples, non_silences, output_path, still=export_mode == "still",
+                bg_color=bg_color, out_size=out_size, crop_box=final_crop_box, scale=scale,
+            )
+            return
 
         logger.info("Ускоряем и согласуем фрагменты...")
         result_parts = [speed_up_segment(video, clip, non_silences, i) for i, clip in enumerate(clips)]
@@ -89,12 +160,29 @@ def run_pipeline(
             video.write_videofile(output_path)
             return
 
+        # final_crop_box гарантированно не None после инициализации выше
+        assert final_crop_box is not None
+
+        if render_cache_dir:
+            logger.info("Экспорт по фрагментам с кешем %s: %s", render_cache_dir, output_path)
+            cache = RenderCache(render_cache_dir, max_bytes=render_cache_max_bytes)
+            # Пока фрагменты кодируются и склеиваются, задачи с тем же кешем не вытеснят их
+            with cache.using():
+                chunks = _render_cached(
+                    cache, input_path, video, non_silences, result_parts, output_path,
+                    bg_color=bg_color, out_size=out_size, crop_box=final_crop_box, scale=scale,
+                )
+            cache.evict(keep=chunks)
+            logger.info(
+                "Кеш рендера: попаданий %d, промахов %d (%.0f%%)",
+                cache.hits, cache.misses, cache.hit_ratio * 100,
+            )
+            return
+
         logger.info("Склейка клипов...")
         merged = concat(result_parts)
 
         logger.info("Компоновка вертикального видео...")
-        # final_crop_box гарантированно не None после инициализации выше
-        assert final_crop_box is not None
         composed = compose_vertical(merged, bg_color=bg_color, out_size=out_size, crop_box=final_crop_box, scale=scale)
 
         logger.info("Экспорт: %s", output_path)
@@ -104,3 +192,115 @@ def run_pipeline(
             video.close()
         except Exception:
             pass
+
+
+def _render_cached(
+    cache: RenderCache,
+    input_path: str,
+    video: Any,
+    non_silences: SegmentArray,
+    result_parts: List[Any],
+    output_path: str,
+    *,
+    bg_color: Tuple[int, int, int],
+    out_size: Tuple[int, int],
+    crop_box: Tuple[int, int, int, int],
+    scale: float,
+) -> List[Path]:
+    """Кодирует видео каждого фрагмента отдельно (или берёт из кеша) и склеивает без перекодирования.
+
+    Фрагменты хранятся без звука. Каждый длится целое число кадров, а звук собирается
+    из исходника под эти длительности и кодируется один раз на весь результат, поэтому
+    на стыках нет щелчков AAC и рассинхрон не накапливается.
+    Вызывается под cache.using(); возвращает пути использованных фрагментов.
+    """
+    logger = logging.getLogger(__name__)
+    fingerprint = source_fingerprint(input_path)
+    ranges = clip_ranges(non_silences, video.duration)
+    fps = video.fps
+    frames = np.array([max(1, round(part.duration * fps)) for part in result_parts], dtype=np.int64)
+    chunks = []
+
+    for i, part in enumerate(result_parts):
+        # Те же границы, что берёт speed_up_segment: звук клипа и видео до следующего сегмента
+        audio_start, audio_end = float(ranges.starts[i]), float(ranges.ends[i])
+        piece_start = float(non_silences.ends[i])
+        piece_end = float(non_silences.starts[i + 1]) if i + 1 < len(non_silences) else float(video.duration)
+        key = RenderCache.make_key(
+            source=fingerprint,
+            audio_range=[audio_start, audio_end],
+            video_range=[piece_start, piece_end],
+            speed=round((piece_end - piece_start) / (audio_end - audio_start), 6),
+            frames=int(frames[i]),
+            layout=dict(bg_color=list(bg_color), out_size=list(out_size), crop_box=list(crop_box), scale=scale),
+            encoder=dict(codec=RENDER_CODEC, preset=RENDER_PRESET, fps=fps, audio=False),
+        )
+        chunk = cache.get(key)
+        if chunk is None:
+            logger.info("Фрагмент %d/%d: кодирование", i + 1, len(result_parts))
+            composed = compose_vertical(
+                part.without_audio(), bg_color=bg_color, out_size=out_size, crop_box=crop_box, scale=scale,
+            ).with_duration(frames[i] / fps)
+            chunk = cache.put(key, lambda tmp: composed.write_videofile(
+                tmp, fps=fps, codec=RENDER_CODEC, preset=RENDER_PRESET, audio=False, logger=None,
+            ))
+        else:
+            logger.info("Фрагмент %d/%d: из кеша", i + 1, len(result_parts))
+        chunks.append(chunk)
+
+    if getattr(video, "audio", None) is None:
+        logger.info("Склейка %d фрагментов без перекодирования...", len(chunks))
+        concat_chunks(chunks, output_path)
+        return chunks
+
+    logger.info("Сборка звука под длительности фрагментов...")
+    samples = decode_audio(input_path, sample_rate=AUDIO_EXPORT_SAMPLE_RATE, duration=video.duration)
+    # Границы считаются по накопленным кадрам, чтобы округление не копилось от фрагмента к фрагменту
+    bounds = np.round(np.concatenate(([0], np.cumsum(frames))) * AUDIO_EXPORT_SAMPLE_RATE / fps).astype(np.int64)
+    audio = cut_to_lengths(samples, ranges, AUDIO_EXPORT_SAMPLE_RATE, np.diff(bounds))
+    del samples
+
+    with tempfile.TemporaryDirectory(prefix="av_editor_") as tmp_dir:
+        audio_path = str(Path(tmp_dir) / "audio.wav")
+        encode_audio(audio, AUDIO_EXPORT_SAMPLE_RATE, audio_path)
+        logger.info("Склейка %d фрагментов без перекодирования видео...", len(chunks))
+        concat_chunks(chunks, output_path, audio_path=audio_path)
+    return chunks
+
+
+def _export_audio_first(
+    video: Any,
+    samples: np.ndarray,
+    non_silences: SegmentArray,
+    output_path: str,
+    *,
+    still: bool,
+    bg_color: Tuple[int, int, int],
+    out_size: Tuple[int, int],
+    crop_box: Tuple[int, int, int, int],
+    scale: float,
+) -> None:
+    """Вырезает речевые фрагменты прямо из PCM и пишет звук (или звук на статичном кадре)."""
+    logger = logging.getLogger(__name__)
+    if len(non_silences):
+        ranges = clip_ranges(non_silences, video.duration).merge_overlaps()
+    else:
+        ranges = SegmentArray([0.0], [video.duration])
+
+    # Фрагменты уходят в ffmpeg по мере нарезки: склеенный звук целиком в памяти не собирается
+    trimmed = iter_with_crossfade(samples, ranges, AUDIO_EXPORT_SAMPLE_RATE)
+
+    if not still:
+        logger.info("Экспорт звука: %s", output_path)
+        written = encode_audio(trimmed, AUDIO_EXPORT_SAMPLE_RATE, output_path)
+    else:
+        with tempfile.TemporaryDirectory(prefix="av_editor_") as tmp_dir:
+            frame_path = str(Path(tmp_dir) / "still.png")
+            composed = compose_vertical(video, bg_color=bg_color, out_size=out_size, crop_box=crop_box, scale=scale)
+            composed.save_frame(frame_path, t=float(ranges.starts[0]))
+            logger.info("Экспорт звука со статичным кадром: %s", output_path)
+            written = encode_audio(trimmed, AUDIO_EXPORT_SAMPLE_RATE, output_path, still_frame=frame_path)
+    logger.info(
+        "Звук: %.1f с → %.1f с",
+        samples.shape[0] / AUDIO_EXPORT_SAMPLE_RATE, written / AUDIO_EXPORT_SAMPLE_RATE,
+    )
@@ -0,0 +1,322 @@
+"""Долгоживущий локальный сервер задач: модели и тяжёлые импорты загружаются один раз.
+
+Протокол (HTTP на localhost, JSON):
+    POST /jobs               — поставить задачу {"input_path": ..., <параметры run_pipeline>} → {"job_id": ...}
+    GET  /jobs/<id>          — состояние задачи
+    GET  /jobs/<id>/events   — поток событий (NDJSON) до завершения задачи
+
+Запуск: python -m src.app.server --port 8765 --workers 2
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from src.app.orchestrator import EXPORT_MODES, run_pipeline
+from src.services.stt_service import load_model
+
+logger = logging.getLogger(__name__)
+
+# Параметры run_pipeline, которые можно передать в задаче, и их типы.
+# interactive/configure_crop не принимаются: у сервера нет терминала.
+_STR, _OPT_STR, _NUMBER, _INT, _BOOL = "str", "str?", "number", "int", "bool"
+JOB_PARAMS: Dict[str, Any] = {
+    "output_path": _STR,
+    "silence_threshold_db": _NUMBER,
+    "min_silence_ms": _INT,
+    "model_path": _STR,
+    "sample_rate": _INT,
+    "bg_color": (3, False),
+    "out_size": (2, False),
+    "crop_box": (4, True),
+    "scale": _NUMBER,
+    "render_cache_dir": _OPT_STR,
+    "render_cache_max_bytes": _INT,
+    "export_mode": _STR,
+    "drop_retakes": _BOOL,
+}
+
+
+def _check_param(key: str, value: Any) -> Any:
+    """Проверить тип параметра задачи; кортежи приходят из JSON списками."""
+    kind = JOB_PARAMS[key]
+    if isinstance(kind, tuple):
+        size, optional = kind
+        if value is None and optional:
+            return None
+        if (
+            not isinstance(value, list)
+            or len(value) != size
+            or not all(isinstance(v, int) and not isinstance(v, bool) for v in value)
+        ):
+            raise ValueError(f"{key}: ожидается список из {size} целых чисел")
+        return tuple(value)
+    if kind == _OPT_STR and value is None:
+        return None
+    if kind in (_STR, _OPT_STR):
+        if not isinstance(value, str) or not value:
+            raise ValueError(f"{key}: ожидается непустая строка")
+    elif kind == _BOOL:
+        if not isinstance(value, bool):
+            raise ValueError(f"{key}: ожидается true/false")
+    elif isinstance(value, bool) or not isinstance(value, int if kind == _INT else (int, float)):
+        raise ValueError(f"{key}: ожидается {'целое ' if kind == _INT else ''}число")
+    return value
+
+
+class Job:
+    """Задача и её журнал событий; читатели ждут новых событий на условной переменной."""
+
+    def __init__(self, input_path: str, params: Dict[str, Any]) -> None:
+        self.id = uuid.uuid4().hex
+        self.input_path = input_path
+        self.params = params
+        self.status = "queued"
+        self.output_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: str, status: Optional[str] = None, **data: Any) -> None:
+        """Добавить событие; смена статуса и событие публикуются атомарно."""
+        with self._cond:
+            if status is not None:
+                self.status = status
+            self.events.append({"event": event, "time": time.time(), **data})
+            self._cond.notify_all()
+
+    def wait_events(self, offset: int, timeout: float = 15.0) -> List[Dict[str, Any]]:
+        """Вернуть события начиная с offset, подождав новые, если их пока нет."""
+        with self._cond:
+            if offset >= len(self.events) and not self.finished:
+                self._cond.wait(timeout)
+            return self.events[offset:]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "input_path": self.input_path,
+            "output_path": self.output_path,
+            "error": self.error,
+        }
+
+
+class _JobLogHandler(logging.Handler):
+    """Пересылает в задачу записи лога, сделанные из потока, который её выполняет."""
+
+    def __init__(self, job: Job, thread_id: int) -> None:
+        super().__init__(level=logging.INFO)
+        self.job = job
+        self.thread_id = thread_id
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.thread != self.thread_id:
+            return
+        try:
+            self.job.emit("progress", message=record.getMessage())
+        except Exception:
+            self.handleError(record)
+
+
+class JobManager:
+    """Ограниченный пул исполнителей и очередь задач."""
+
+    def __init__(self, workers: int = 2, max_pending: int = 16,
+                 defaults: Optional[Dict[str, Any]] = None, max_history: int = 256) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_history = max_history
+        self.defaults = dict(defaults or {})
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, input_path: str, params: Dict[str, Any]) -> Optional[Job]:
+        """Поставить задачу; None — очередь переполнена."""
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if not j.finished)
+            if active >= self.workers + self.max_pending:
+                return None
+            job = Job(input_path, {**self.defaults, **params})
+            self._jobs[job.id] = job
+            # Забываем самые старые завершённые задачи (dict хранит порядок добавления)
+            finished = [j.id for j in self._jobs.values() if j.finished]
+            for job_id in finished[:max(0, len(finished) - self.max_history)]:
+                del self._jobs[job_id]
+        job.emit("queued")
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job) -> None:
+        handler = _JobLogHandler(job, threading.get_ident())
+        root = logging.getLogger()
+        root.addHandler(handler)
+        job.emit("started", status="running")
+        started = time.monotonic()
+        try:
+            output_path = job.params.get("output_path", "exp.mp4")
+            run_pipeline(job.input_path, interactive=False, configure_crop=False, **job.params)
+            job.output_path = output_path
+            job.emit("done", status="done", output_path=output_path, elapsed=time.monotonic() - started)
+        except Exception as e:
+            logger.exception("Job %s failed", job.id)
+            job.error = str(e)
+            job.emit("failed", status="failed", error=str(e))
+        finally:
+            root.removeHandler(handler)
+
+
+def parse_job_request(payload: Any) -> tuple[str, Dict[str, Any]]:
+    """Проверить тело POST /jobs и вернуть (input_path, параметры run_pipeline)."""
+    if not isinstance(payload, dict):
+        raise ValueError("Ожидается JSON-объект")
+    input_path = payload.get("input_path")
+    if not isinstance(input_path, str) or not input_path:
+        raise ValueError("Не указан input_path")
+    unknown = set(payload) - set(JOB_PARAMS) - {"input_path"}
+    if unknown:
+        raise ValueError(f"Неизвестные параметры: {', '.join(sorted(unknown))}")
+    params = {k: _check_param(k, v) for k, v in payload.items() if k in JOB_PARAMS}
+    if params.get("export_mode", "video") not in EXPORT_MODES:
+        raise ValueError(f"export_mode: ожидается один из {', '.join(EXPORT_MODES)}")
+    return input_path, params
+
+
+class _Handler(BaseHTTPRequestHandler):
+    manager: JobManager
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            input_path, params = parse_job_request(json.loads(self.rfile.read(length) or b"null"))
+        except (ValueError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        job = self.manager.submit(input_path, params)
+        if job is None:
+            self._send_json(503, {"error": "очередь задач переполнена"})
+            return
+        self._send_json(202, {"job_id": job.id})
+
+    def do_GET(self) -> None:
+        parts = [p for p in self.path.split("/") if p]
+        if len(parts) < 2 or parts[0] != "jobs" or len(parts) > 3 or (len(parts) == 3 and parts[2] != "events"):
+            self._send_json(404, {"error": "not found"})
+            return
+        job = self.manager.get(parts[1])
+        if job is None:
+            self._send_json(404, {"error": "unknown job"})
+            return
+        if len(parts) == 2:
+            self._send_json(200, job.summary())
+            return
+        self._stream_events(job)
+
+    def _stream_events(self, job: Job) -> None:
+        # HTTP/1.0 без Content-Length: поток заканчивается закрытием соединения
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        offset = 0
+        try:
+            while True:
+                events = job.wait_events(offset)
+                for ev in events:
+                    self.wfile.write((json.dumps(ev, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+                offset += len(events)
+                if job.finished and offset >= len(job.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def is_loopback(host: str) -> bool:
+    """Все адреса, в которые разрешается host, — loopback (127.0.0.0/8, ::1)."""
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        return False
+    return bool(infos) and all(ipaddress.ip_address(info[4][0].split("%")[0]).is_loopback for info in infos)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, *, workers: int = 2, max_pending: int = 16,
+          model_path: Optional[str] = "vosk-model") -> None:
+    # Аутентификации нет, а задачи читают и пишут произвольные пути от имени сервера,
+    # поэтому слушать можно только loopback
+    if not is_loopback(host):
+        raise ValueError(f"Сервер задач слушает только loopback-адреса, а не {host!r}")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    if model_path:
+        # Клиент присылает абсолютные пути — ключ кеша load_model должен совпадать
+        model_path = os.path.abspath(model_path)
+        logger.info("Прогрев модели Vosk: %s", model_path)
+        load_model(model_path)
+
+    defaults = {"model_path": model_path} if model_path else None
+    manager = JobManager(workers=workers, max_pending=max_pending, defaults=defaults)
+    handler = type("Handler", (_Handler,), {"manager": manager})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    logger.info("Сервер задач слушает http://%s:%d (исполнителей: %d)", host, httpd.server_port, workers)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        manager.shutdown()
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Auto Video Editor job server")
+    p.add_argument("--host", default="127.0.0.1", help="Loopback-адрес для прослушивания")
+    p.add_argument("--port", type=int, default=8765, help="Порт")
+    p.add_argument("--workers", type=int, default=2, help="Число одновременно выполняемых задач")
+    p.add_argument("--max-pending", type=int, default=16, help="Максимум задач в очереди")
+    p.add_argument("--model-path", default="vosk-model", help="Модель Vosk для прогрева")
+    args = p.parse_args()
+    if not is_loopback(args.host):
+        p.error(f"--host: допустимы только loopback-адреса (127.0.0.1, ::1, localhost), получено {args.host!r}")
+    serve(args.host, args.port, workers=args.workers, max_pending=args.max_pending, model_path=args.model_path)
+
+
+if __name__ == "__main__":
+    main()
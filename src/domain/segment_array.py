@@ -0,0 +1,136 @@
+"""Колоночное представление набора интервалов (start/end в NumPy-массивах)."""
+
+from __future__ import annotations
+
+from typing import Iterable, Iterator, List, Sequence, Union, overload
+
+import numpy as np
+
+from src.domain.entities import Segment
+
+
+class SegmentArray:
+    """Неизменяемый набор интервалов в секундах с векторизованными операциями.
+
+    Поддерживает протокол последовательности ``Segment`` (``len``, индексация,
+    итерация), поэтому может передаваться везде, где ожидается ``Sequence[Segment]``.
+    Все операции возвращают новый экземпляр.
+    """
+
+    __slots__ = ("_starts", "_ends")
+
+    def __init__(self, starts: Iterable[float] = (), ends: Iterable[float] = ()) -> None:
+        s = np.array(starts, dtype=np.float64).reshape(-1)
+        e = np.array(ends, dtype=np.float64).reshape(-1)
+        if s.shape != e.shape:
+            raise ValueError(f"starts/ends length mismatch: {s.size} != {e.size}")
+        s.flags.writeable = False
+        e.flags.writeable = False
+        self._starts = s
+        self._ends = e
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Segment]) -> "SegmentArray":
+        if isinstance(segments, SegmentArray):
+            return segments
+        pairs = [(seg.start, seg.end) for seg in segments]
+        if not pairs:
+            return cls()
+        starts, ends = zip(*pairs)
+        return cls(starts, ends)
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends
+
+    @property
+    def durations(self) -> np.ndarray:
+        return self._ends - self._starts
+
+    def to_segments(self) -> List[Segment]:
+        return [Segment(float(s), float(e)) for s, e in zip(self._starts, self._ends)]
+
+    def __len__(self) -> int:
+        return int(self._starts.size)
+
+    def __iter__(self) -> Iterator[Segment]:
+        return iter(self.to_segments())
+
+    @overload
+    def __getitem__(self, key: int) -> Segment: ...
+
+    @overload
+    def __getitem__(self, key: Union[slice, Sequence[int], np.ndarray]) -> "SegmentArray": ...
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return Segment(float(self._starts[key]), float(self._ends[key]))
+        return SegmentArray(self._starts[key], self._ends[key])
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, SegmentArray):
+            return NotImplemented
+        return np.array_equal(self._starts, other._starts) and np.array_equal(self._ends, other._ends)
+
+    def __repr__(self) -> str:
+        body = ", ".join(f"({s:.3f}, {e:.3f})" for s, e in zip(self._starts, self._ends))
+        return f"SegmentArray([{body}])"
+
+    def sorted(self) -> "SegmentArray":
+        order = np.lexsort((self._ends, self._starts))
+        return SegmentArray(self._starts[order], self._ends[order])
+
+    def complement(self, total_duration: float, min_length: float = 1e-3) -> "SegmentArray":
+        """Промежутки [0, total_duration], не покрытые интервалами.
+
+        Как и исходный цикл ``get_non_silences``, ожидает упорядоченные интервалы.
+        """
+        bounds_start = np.concatenate(([0.0], self._ends))
+        bounds_end = np.concatenate((self._starts, [float(total_duration)]))
+        keep = bounds_end - bounds_start > min_length
+        return SegmentArray(bounds_start[keep], bounds_end[keep])
+
+    def pad(self, before: float, after: float | None = None) -> "SegmentArray":
+        after = before if after is None else after
+        return SegmentArray(self._starts - before, self._ends + after)
+
+    def clamp(self, lo: float, hi: float) -> "SegmentArray":
+        """Обрезать интервалы границами [lo, hi], отбросив вырожденные."""
+        s = np.clip(self._starts, lo, hi)
+        e = np.clip(self._ends, lo, hi)
+        keep = e > s
+        return SegmentArray(s[keep], e[keep])
+
+    def coalesce(self, min_gap: float = 0.0) -> "SegmentArray":
+        """Слить пересекающиеся интервалы и интервалы с зазором не больше ``min_gap``."""
+        if len(self) == 0:
+            return self
+        ordered = self.sorted()
+        s, e = ordered._starts, ordered._ends
+        # Конец «текущей группы» — накопленный максимум концов предыдущих интервалов.
+        reach = np.maximum.accumulate(e)
+        new_group = np.empty(s.size, dtype=bool)
+        new_group[0] = True
+        new_group[1:] = s[1:] - reach[:-1] > min_gap
+        group_starts = np.flatnonzero(new_group)
+        group_ends = np.append(group_starts[1:], s.size) - 1
+        return SegmentArray(s[group_starts], reach[group_ends])
+
+    def merge_overlaps(self) -> "SegmentArray":
+        return self.coalesce(0.0)
+
+    def delete(self, indices: Iterable[int]) -> "SegmentArray":
+        """Удалить интервалы по индексам; индексы вне диапазона игнорируются."""
+        mask = self.index_mask(indices)
+        return SegmentArray(self._starts[mask], self._ends[mask])
+
+    def index_mask(self, indices: Iterable[int]) -> np.ndarray:
+        """Булева маска «оставить» для списка удаляемых индексов (см. ``delete``)."""
+        mask = np.ones(len(self), dtype=bool)
+        idx = np.fromiter((int(i) for i in indices), dtype=np.int64)
+        mask[idx[(idx >= 0) & (idx < len(self))]] = False
+        return mask
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional, Union
+import itertools
+import subprocess
+
+import numpy as np
+
+from src.domain.segment_array import SegmentArray
+
+
+def _ffmpeg_exe() -> str:
+    import imageio_ffmpeg
+
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+# Сколько отсчётов за раз отдаётся ffmpeg при кодировании
+_WRITE_FRAMES = 1 << 16
+
+
+def decode_audio(
+    path: str,
+    sample_rate: int = 44100,
+    channels: int = 2,
+    duration: Optional[float] = None,
+) -> np.ndarray:
+    """Декодировать звуковую дорожку файла в int16-массив формы (samples, channels) одним проходом ffmpeg.
+
+    Поток читается прямо в массив, выделенный по duration (если известна), без промежуточных
+    bytes: час стерео 44.1 кГц занимает около 635 МБ.
+    """
+    cmd = [
+        _ffmpeg_exe(), "-loglevel", "error",
+        "-i", path,
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ac", str(channels), "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    capacity = int((duration + 1.0) * sample_rate) if duration else 60 * sample_rate
+    out = np.empty((capacity, channels), dtype=np.int16)
+    filled = 0
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE) as proc:
+        assert proc.stdout is not None
+        while True:
+            if filled == out.nbytes:
+                grown = np.empty((out.shape[0] * 2, channels), dtype=np.int16)
+                grown[:out.shape[0]] = out
+                out = grown
+            n = proc.stdout.readinto(memoryview(out).cast("B")[filled:])
+            if not n:
+                break
+            filled += n
+        if proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return out[:filled // out[:1].nbytes]
+
+
+def iter_with_crossfade(
+    samples: np.ndarray,
+    ranges: SegmentArray,
+    sample_rate: int,
+    crossfade_ms: float = 10.0,
+) -> Iterator[np.ndarray]:
+    """Фрагменты ranges (секунды) подряд с линейным кроссфейдом на стыках.
+
+    Отдаются срезы исходника без копирования; новым массивом становится только смешанный
+    стык длиной в кроссфейд. Звук укорачивается на длину кроссфейда на каждом стыке.
+    """
+    total = samples.shape[0]
+    starts = np.clip(np.round(ranges.starts * sample_rate).astype(np.int64), 0, total)
+    ends = np.clip(np.round(ranges.ends * sample_rate).astype(np.int64), 0, total)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if starts.size == 0:
+        return
+
+    k = int(sample_rate * crossfade_ms / 1000.0)
+    k = max(0, min(k, int((ends - starts).min()) // 2)) if starts.size > 1 else 0
+    ramp = np.linspace(0.0, 1.0, k, endpoint=False, dtype=np.float32).reshape((k,) + (1,) * (samples.ndim - 1))
+    last = starts.size - 1
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        if i and k:
+            prev_end = ends[i - 1]
+            mixed = samples[prev_end - k:prev_end] * (1.0 - ramp) + samples[start:start + k] * ramp
+            if np.issubdtype(samples.dtype, np.integer):
+                np.rint(mixed, out=mixed)
+            yield mixed.astype(samples.dtype)
+            start += k
+        # Хвост фрагмента уходит в следующий стык
+        yield samples[start:end - k if i < last else end]
+
+
+def cut_with_crossfade(
+    samples: np.ndarray,
+    ranges: SegmentArray,
+    sample_rate: int,
+    crossfade_ms: float = 10.0,
+) -> np.ndarray:
+    """Склеить фрагменты ranges (секунды) с линейным кроссфейдом на стыках в один массив.
+
+    Для записи в файл лучше передать iter_with_crossfade прямо в encode_audio — тогда
+    склеенный звук целиком в памяти не собирается.
+    """
+    pieces = list(iter_with_crossfade(samples, ranges, sample_rate, crossfade_ms))
+    return np.concatenate(pieces) if pieces else samples[:0]
+
+
+def cut_to_lengths(samples: np.ndarray, ranges: SegmentArray, sample_rate: int, lengths: np.ndarray) -> np.ndarray:
+    """Склеить фрагменты ranges встык, подогнав i-й ровно под lengths[i] отсчётов.
+
+    Хвост обрезается или дополняется тишиной — так звук точно совпадает с длительностью
+    видеофрагментов, закодированных отдельно.
+    """
+    total = samples.shape[0]
+    out = np.zeros((int(lengths.sum()),) + samples.shape[1:], dtype=samples.dtype)
+    pos = 0
+    for start_s, end_s, length in zip(ranges.starts, ranges.ends, lengths):
+        start = min(int(round(start_s * sample_rate)), total)
+        end = min(int(round(end_s * sample_rate)), total, start + int(length))
+        out[pos:pos + end - start] = samples[start:end]
+        pos += int(length)
+    return out
+
+
+def encode_audio(
+    samples: Union[np.ndarray, Iterable[np.ndarray]],
+    sample_rate: int,
+    output_path: str,
+    still_frame: Optional[str] = None,
+    still_fps: float = 1.0,
+) -> int:
+    """Записать PCM (int16 или float) в output_path (формат по расширению); возвращает число отсчётов.
+
+    samples — массив или поток фрагментов одного формата (например, iter_with_crossfade).
+    Данные отдаются ffmpeg кусками, без копии всего звука в bytes.
+    Если указан still_frame, звук сводится с одной картинкой, повторяемой с частотой still_fps.
+    """
+    pieces = iter([samples]) if isinstance(samples, np.ndarray) else iter(samples)
+    first = next(pieces, None)
+    if first is None:
+        first = np.zeros((0, 2), dtype=np.int16)
+    pieces = itertools.chain([first], pieces)
+    integer = first.dtype == np.int16
+    channels = first.shape[1] if first.ndim == 2 else 1
+
+    cmd = [_ffmpeg_exe(), "-y", "-loglevel", "error"]
+    if still_frame is not None:
+        cmd += ["-loop", "1", "-framerate", str(still_fps), "-i", still_frame]
+    cmd += ["-f", "s16le" if integer else "f32le", "-ar", str(sample_rate), "-ac", str(channels), "-i", "pipe:0"]
+    if still_frame is not None:
+        cmd += [
+            "-c:v", "libx264", "-tune", "stillimage", "-pix_fmt", "yuv420p", "-r", str(still_fps),
+            "-c:a", "aac", "-shortest", "-movflags", "+faststart",
+        ]
+    cmd.append(output_path)
+
+    written = 0
+    with subprocess.Popen(cmd, stdin=subprocess.PIPE) as proc:
+        assert proc.stdin is not None
+        try:
+            for piece in pieces:
+                for a in range(0, piece.shape[0], _WRITE_FRAMES):
+                    block = piece[a:a + _WRITE_FRAMES]
+                    proc.stdin.write(np.ascontiguousarray(block, dtype=np.int16 if integer else np.float32).data)
+                written += piece.shape[0]
+        except BrokenPipeError:
+            pass
+        finally:
+            proc.stdin.close()
+        if proc.wait():
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return written
@@ -4,9 +4,11 @@ from typing import List, Sequence, Optional, Any
 from pathlib import Path
 import tempfile
 
+import numpy as np
 import pydub
 
 from src.domain.entities import Segment
+from src.domain.segment_array import SegmentArray
 
 
 def find_silence(
@@ -55,16 +57,47 @@ def find_silence(
             pass
 
 
-def get_non_silences(silences: Sequence[Segment], total_duration: float) -> List[Segment]:
-    r: List[Segment] = []
-    last = 0.0
-
-    for seg in silences:
-        if seg.start > last:
-            r.append(Segment(last, seg.start))
-        last = seg.end
-
-    if last < total_duration:
-        r.append(Segment(last, total_duration))
-
-    return [s for s in r if s.end - s.start > 1e-3]
+def find_silence_pcm(
+    samples: np.ndarray,
+    sample_rate: int,
+    silence_threshold_db: float = -20.0,
+    min_silence_ms: int = 750,
+    block_ms: int = 60_000,
+) -> List[Segment]:
+    """Detect silence in already decoded PCM (samples x channels): int16, or float with full scale 1.0.
+    Same rules as find_silence (per-ms dBFS, trailing silence kept, leading one dropped),
+    but RMS is computed with NumPy block by block instead of a per-ms Python loop.
+    Integer blocks are converted to float32 one at a time, so the track is never copied whole.
+    """
+    frames = samples.shape[0]
+    n_ms = frames * 1000 // sample_rate
+    if n_ms == 0:
+        return []
+    channels = samples.shape[1] if samples.ndim == 2 else 1
+    # dBFS like pydub: relative to the largest magnitude of the sample type
+    full_scale = float(np.iinfo(samples.dtype).max + 1) if np.issubdtype(samples.dtype, np.integer) else 1.0
+    bounds = np.arange(n_ms + 1, dtype=np.int64) * sample_rate // 1000
+
+    below = np.empty(n_ms, dtype=bool)
+    for a in range(0, n_ms, block_ms):
+        b = min(a + block_ms, n_ms)
+        block = samples[bounds[a]:bounds[b]].reshape(-1, channels).astype(np.float32, copy=False)
+        power = np.einsum("ij,ij->i", block, block)
+        mean_square = np.add.reduceat(power, bounds[a:b] - bounds[a]) / (np.diff(bounds[a:b + 1]) * channels)
+        mean_square /= full_scale * full_scale
+        with np.errstate(divide="ignore"):
+            below[a:b] = 10.0 * np.log10(mean_square) < silence_threshold_db
+
+    edges = np.diff(np.concatenate(([0], below.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts > min_silence_ms) | (ends == n_ms)
+    starts, ends = starts[keep], ends[keep]
+    if starts.size and starts[0] == 0:
+        starts, ends = starts[1:], ends[1:]
+
+    return [Segment(s / 1000.0, e / 1000.0) for s, e in zip(starts.tolist(), ends.tolist())]
+
+
+def get_non_silences(silences: Sequence[Segment], total_duration: float) -> SegmentArray:
+    return SegmentArray.from_segments(silences).complement(total_duration, min_length=1e-3)
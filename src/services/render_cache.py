@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, Optional, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки каталога между процессами нет
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Сколько байт с начала и с конца файла участвуют в отпечатке исходника
+_FINGERPRINT_BYTES = 1 << 20
+
+
+def source_fingerprint(path: str) -> str:
+    """Дешёвый отпечаток исходного файла: размер, mtime и хеш первого/последнего мегабайта."""
+    p = Path(path)
+    st = p.stat()
+    digest = hashlib.sha256()
+    digest.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(p, "rb") as f:
+        digest.update(f.read(_FINGERPRINT_BYTES))
+        if st.st_size > _FINGERPRINT_BYTES:
+            f.seek(max(_FINGERPRINT_BYTES, st.st_size - _FINGERPRINT_BYTES))
+            digest.update(f.read(_FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Кеш закодированных фрагментов результата с вытеснением по суммарному размеру.
+
+    Фрагмент адресуется ключом — хешем всех входов, от которых зависит его кодирование.
+    Вытесняются давно не использованные фрагменты (по mtime, обновляется при попадании).
+    Кеш может разделяться несколькими задачами и процессами: рендер идёт под разделяемой
+    блокировкой каталога (using), вытеснение — под исключительной.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 10 * 1024 ** 3, suffix: str = ".mp4") -> None:
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(**inputs: Any) -> str:
+        payload = json.dumps(inputs, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    @contextmanager
+    def _dir_lock(self, shared: bool, blocking: bool) -> Iterator[bool]:
+        """flock на cache_dir/.lock; отдаёт False, если неблокирующий захват не удался."""
+        if fcntl is None:
+            yield True
+            return
+        with open(self.cache_dir / ".lock", "ab") as f:
+            flags = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+            try:
+                fcntl.flock(f.fileno(), flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def using(self) -> Iterator[None]:
+        """Разделяемая блокировка на время рендера: пока она держится, evict не удалит фрагменты."""
+        with self._dir_lock(shared=True, blocking=True):
+            yield
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key: str, write: Callable[[str], None]) -> Path:
+        """Записать фрагмент: write(tmp_path) кодирует во временный файл, затем атомарное переименование."""
+        path = self.path_for(key)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix=self.suffix, dir=self.cache_dir)
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+        return path
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def evict(self, keep: Sequence[Path] = ()) -> int:
+        """Удалить самые старые фрагменты сверх max_bytes; возвращает число освобождённых байт.
+
+        Вызывается вне using. Если кеш сейчас использует другая задача, вытеснение
+        пропускается: его выполнит задача, которая освободит кеш последней.
+        """
+        with self._dir_lock(shared=False, blocking=False) as locked:
+            if not locked:
+                logger.info("Render cache: in use by another job, eviction postponed")
+                return 0
+            freed = self._evict_locked({Path(p).resolve() for p in keep})
+        if freed:
+            logger.info("Render cache: evicted %d bytes", freed)
+        return freed
+
+    def _evict_locked(self, protected: set) -> int:
+        entries = []
+        for p in self.cache_dir.glob(f"*{self.suffix}"):
+            if p.name.startswith(".tmp_"):
+                continue
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        freed = 0
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total - freed <= self.max_bytes:
+                break
+            if p.resolve() in protected:
+                continue
+            p.unlink(missing_ok=True)
+            freed += size
+        return freed
+
+
+def concat_chunks(chunks: Sequence[Path], output_path: str, audio_path: Optional[str] = None) -> None:
+    """Склеить фрагменты с одинаковыми параметрами кодирования без перекодирования (ffmpeg concat).
+
+    Если указан audio_path, к склеенному видео добавляется эта дорожка, закодированная
+    в AAC один раз на весь результат: без стыков отдельных AAC-потоков на границах фрагментов.
+    """
+    import imageio_ffmpeg
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        for chunk in chunks:
+            escaped = str(Path(chunk).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+        list_path = f.name
+
+    try:
+        subprocess.run(
+            [
+                imageio_ffmpeg.get_ffmpeg_exe(),
+                "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0",
+                "-i", list_path,
+                *(
+                    ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", "aac"]
+                    if audio_path is not None else ["-c", "copy"]
+                ),
+                "-movflags", "+faststart",
+                output_path,
+            ],
+            check=True,
+        )
+    finally:
+        Path(list_path).unlink(missing_ok=True)
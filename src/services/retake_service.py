@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+from typing import List, Sequence, Tuple
+import re
+
+import numpy as np
+
+from src.domain.entities import TranscriptSegment
+
+# Множитель для перемешивания битов n-граммы (золотое сечение, 64 бита)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("ё", "е")
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", text)).strip()
+
+
+def _ngram_hashes(norms: Sequence[str], n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """32-битные хеши всех символьных n-грамм всех текстов и номер текста для каждой.
+
+    Тексты склеиваются через NUL и обрабатываются одним массивом кодов символов;
+    n-граммы, пересекающие границу текста, отбрасываются. Повторы n-грамм не удаляются:
+    на минимум MinHash они не влияют.
+    """
+    codes = np.frombuffer("\x00".join(norms).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if codes.size < n:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    sep = codes == 0
+    seps_before = np.concatenate(([0], np.cumsum(sep)))
+    starts = np.arange(codes.size - n + 1)
+    valid = seps_before[starts + n] == seps_before[starts]
+
+    gram = np.zeros(starts.size, dtype=np.uint64)
+    for k in range(n):
+        # Полином по кодам символов; переполнение uint64 здесь допустимо
+        gram = gram * np.uint64(0x110000) + codes[k:k + starts.size]
+    hashes = (gram * _MIX) >> np.uint64(32)
+    return hashes[valid], seps_before[starts[valid]].astype(np.int64)
+
+
+def _signatures(norms: Sequence[str], num_perm: int, ngram: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    # Семейство multiply-shift: ((a * x + b) mod 2**64) >> 32, a нечётное
+    a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    sig = np.full((len(norms), num_perm), _MAX_HASH, dtype=np.uint64)
+    flat, owners = _ngram_hashes(norms, ngram)
+    if flat.size == 0:
+        return sig
+
+    counts = np.bincount(owners, minlength=len(norms))
+    nonempty = np.flatnonzero(counts)
+    bounds = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+    # Каждая хеш-функция применяется сразу ко всем n-граммам всех текстов, минимум по
+    # каждому тексту — через reduceat по границам групп. Одномерный reduceat по
+    # перестановкам заметно быстрее reduceat по оси 0 двумерного массива.
+    hashed = np.empty_like(flat)
+    for k in range(num_perm):
+        np.multiply(flat, a[k], out=hashed)
+        hashed += b[k]
+        hashed >>= np.uint64(32)
+        sig[nonempty, k] = np.minimum.reduceat(hashed, bounds)
+    return sig
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = 64, ngram: int = 3, seed: int = 1) -> np.ndarray:
+    """MinHash-сигнатуры текстов по символьным n-граммам, массив (len(texts), num_perm).
+
+    Тексты короче n-граммы получают сигнатуру из максимальных значений.
+    """
+    return _signatures([_normalize(t) for t in texts], num_perm, ngram, seed)
+
+
+def find_retakes(
+    transcripts: Sequence[TranscriptSegment],
+    threshold: float = 0.6,
+    max_distance: int = 3,
+    min_chars: int = 12,
+    num_perm: int = 64,
+    bands: int = 16,
+    ngram: int = 3,
+) -> List[int]:
+    """Индексы (с нуля) сегментов, похожих на неудачные дубли: более ранний из пары близких по тексту.
+
+    Кандидаты ищутся LSH по полосам MinHash-сигнатур (без сравнения всех пар):
+    в каждой полосе сегменты с одинаковым хешем полосы сортируются по номеру, и парой
+    считаются соседи в такой группе, отстоящие не более чем на max_distance сегментов.
+    Пара подтверждается, если оценка коэффициента Жаккара не ниже threshold.
+    """
+    n = len(transcripts)
+    if n < 2:
+        return []
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+    norms = [_normalize(t.text) for t in transcripts]
+    sig = _signatures(norms, num_perm, ngram, seed=1)
+    eligible = np.fromiter((len(s) >= min_chars for s in norms), dtype=bool, count=n)
+    idx = np.flatnonzero(eligible)
+    if idx.size < 2:
+        return []
+
+    rows = num_perm // bands
+    # Хеш полосы — полином от её строк; переполнение uint64 здесь допустимо
+    weights = np.uint64(1000003) ** np.arange(rows, dtype=np.uint64)
+    band_hashes = (sig[idx].reshape(idx.size, bands, rows) * weights).sum(axis=2, dtype=np.uint64)
+
+    left: List[np.ndarray] = []
+    right: List[np.ndarray] = []
+    for band in range(bands):
+        h = band_hashes[:, band]
+        order = np.lexsort((idx, h))
+        same = h[order][1:] == h[order][:-1]
+        i, j = idx[order][:-1][same], idx[order][1:][same]
+        close = (j - i) <= max_distance
+        left.append(i[close])
+        right.append(j[close])
+
+    i = np.concatenate(left)
+    j = np.concatenate(right)
+    if i.size == 0:
+        return []
+    pairs = np.unique(np.stack((i, j), axis=1), axis=0)
+    similarity = (sig[pairs[:, 0]] == sig[pairs[:, 1]]).mean(axis=1)
+    return sorted(int(k) for k in np.unique(pairs[similarity >= threshold, 0]))
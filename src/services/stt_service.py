@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from typing import Any
+from functools import lru_cache
 from pathlib import Path
 import json
 import tempfile
@@ -9,11 +10,25 @@ import pydub
 import vosk
 
 
+# Модель Vosk занимает гигабайты: держим прогретую и ещё одну, а не все когда-либо запрошенные
+MODEL_CACHE_SIZE = 2
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def load_model(model_path: str) -> Any:
+    """Загружает модель Vosk один раз на процесс; модель можно разделять между распознавателями.
+
+    Кеш ограничен MODEL_CACHE_SIZE моделями: вытесненная освобождается, когда на неё
+    не остаётся ссылок у распознавателей.
+    """
+    return vosk.Model(model_path)
+
+
 class VoskSttService:
     def __init__(self, model_path: str = "vosk-model", sample_rate: int = 16000) -> None:
         self.model_path = model_path
         self.sample_rate = sample_rate
-        self._recognizer = vosk.KaldiRecognizer(vosk.Model(model_path), sample_rate)
+        self._recognizer = vosk.KaldiRecognizer(load_model(model_path), sample_rate)
 
     def recognize_clip(self, clip: Any) -> str:
         """Extracts audio from the video clip, resamples to 16k mono PCM, and runs Vosk."""
@@ -5,17 +5,21 @@ from typing import List, Sequence, Any
 from moviepy import concatenate_videoclips, vfx
 
 from src.domain.entities import Segment
+from src.domain.segment_array import SegmentArray
+
+# Запас по краям каждого речевого фрагмента, секунды
+CLIP_PADDING = 0.3
+
+
+def clip_ranges(non_silences: Sequence[Segment], duration: float, padding: float = CLIP_PADDING) -> SegmentArray:
+    """Границы клипов: речевые сегменты с запасом ``padding``, обрезанные по длительности видео."""
+    return SegmentArray.from_segments(non_silences).pad(padding).clamp(0.0, duration)
 
 
 def split_to_clips(video: Any, non_silences: Sequence[Segment]) -> List[Any]:
-    clips: List[Any] = []
-    for seg in non_silences:
-        dl = 0.3
-        start = max(0.0, seg.start - dl)
-        end = min(video.duration, seg.end + dl)
-        # MoviePy v2: метод называется subclipped
-        clips.append(video.subclipped(start, end))
-    return clips
+    ranges = clip_ranges(non_silences, video.duration)
+    # MoviePy v2: метод называется subclipped
+    return [video.subclipped(float(s), float(e)) for s, e in zip(ranges.starts, ranges.ends)]
 
 
 def speed_up_segment(full_video: Any, clip: Any, non_silences: Sequence[Segment], i: int) -> Any:
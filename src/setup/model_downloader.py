@@ -1,44 +1,366 @@
+import hashlib
+import os
 import shutil
+import socket
 import tempfile
+import threading
+import time
+import urllib.parse
 import urllib.request
+import uuid
 import zipfile
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Callable
 
 
 logger = logging.getLogger(__name__)
 
+# Размер буфера чтения/записи при скачивании, распаковке и хешировании
+CHUNK_SIZE = 1 << 20
+# Минимальный размер одной части при параллельном скачивании
+MIN_PART_SIZE = 16 << 20
 
-def download_and_extract_zip(url: str, dest_dir: Path, expected_subdir_name: str | None = None, timeout: int = 30) -> bool:
+
+def _probe(url: str, timeout: int) -> tuple[int | None, bool]:
     """
-    Скачивает zip в временную папку, распаковывает и атомарно перемещает в dest_dir.
-    Если expected_subdir_name указан — проверяет, что распаковка содержит такую папку.
-    Показ прогресса скачивания и распаковки через tqdm.
+    Определяет размер файла и поддержку Range-запросов.
+    Запрашивает первый байт: 206 с Content-Range означает, что сервер умеет отдавать части.
+    """
+    req = urllib.request.Request(url, headers={"Range": "bytes=0-0"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        content_range = resp.getheader("Content-Range") or ""
+        if resp.getcode() == 206 and "/" in content_range:
+            total = content_range.rsplit("/", 1)[1].strip()
+            return (int(total) if total.isdigit() else None), True
+        length = resp.getheader("Content-Length")
+        return (int(length) if length and length.isdigit() else None), False
+
+
+def _download_range(url: str, part_path: Path, start: int, end: int | None, timeout: int,
+                    progress: Callable[[int], None], resumable: bool = True, max_retries: int = 3) -> None:
+    """
+    Докачивает байты [start, end] в part_path, продолжая с уже скачанного.
+    end=None — до конца файла (используется без параллельности).
+    resumable=False — сервер не поддерживает Range, каждая попытка начинается с нуля.
+    """
+    length = None if end is None else end - start + 1
+    for attempt in range(1, max_retries + 1):
+        if not resumable:
+            part_path.unlink(missing_ok=True)
+        done = part_path.stat().st_size if part_path.exists() else 0
+        if length is not None and done >= length:
+            return
+        headers = {"Range": f"bytes={start + done}-{'' if end is None else end}"} if done or end is not None else {}
+        try:
+            req = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                if headers and resp.getcode() != 206:
+                    raise IOError(f"Server ignored Range request for {url}")
+                with open(part_path, "ab", buffering=CHUNK_SIZE) as out:
+                    while True:
+                        chunk = resp.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        progress(len(chunk))
+            if length is None or part_path.stat().st_size >= length:
+                return
+            raise IOError(f"Incomplete part {part_path.name}")
+        except Exception as e:
+            logger.warning("Part %s failed (attempt %d/%d): %s", part_path.name, attempt, max_retries, e)
+            if attempt == max_retries:
+                raise
+            time.sleep(2)
+
+
+def sha256_file(path: Path) -> str:
+    """Считает SHA-256 файла блоками по CHUNK_SIZE."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def download_file(url: str, dest: Path, connections: int = 4, timeout: int = 30,
+                  expected_sha256: str | None = None) -> None:
+    """
+    Скачивает url в dest несколькими параллельными Range-запросами.
+    Части хранятся рядом с dest (dest.partIofN) и докачиваются при повторном запуске.
+    После сборки проверяет SHA-256, если он указан. При ошибке бросает исключение.
     """
     from tqdm import tqdm
 
-    dest_dir = dest_dir.resolve()
-    tmp_dir = Path(tempfile.mkdtemp(prefix="av_editor_"))
-    archive_path = tmp_dir / "model.zip"
+    total, ranged = _probe(url, timeout)
+    if not ranged or not total:
+        bounds = [(0, None)]
+        if connections > 1:
+            logger.info("Server does not support ranged requests; downloading in one stream")
+    else:
+        n = max(1, min(connections, total // MIN_PART_SIZE or 1))
+        step = -(-total // n)
+        bounds = [(s, min(s + step, total) - 1) for s in range(0, total, step)]
 
-    try:
-        logger.info("Downloading %s → %s", url, archive_path)
-        with urllib.request.urlopen(url, timeout=timeout) as resp:
-            total = resp.getheader('Content-Length')
-            total = int(total) if total and total.isdigit() else None
-            with open(archive_path, "wb") as out, tqdm(total=total, unit='B', unit_scale=True, desc='Downloading', leave=True) as pbar:
+    # Число частей входит в имя, чтобы не склеить куски от запуска с другим разбиением
+    parts = [Path(f"{dest}.part{i}of{len(bounds)}") for i in range(len(bounds))]
+    resumed = sum(p.stat().st_size for p in parts if p.exists()) if ranged else 0
+    if resumed:
+        logger.info("Resuming download: %d bytes already present", resumed)
+
+    logger.info("Downloading %s → %s (%d connection(s))", url, dest, len(bounds))
+    lock = threading.Lock()
+    with tqdm(total=total, initial=resumed, unit='B', unit_scale=True, desc='Downloading', leave=True) as pbar:
+        def progress(n: int) -> None:
+            with lock:
+                pbar.update(n)
+
+        with ThreadPoolExecutor(max_workers=len(bounds)) as pool:
+            futures = [pool.submit(_download_range, url, part, start, end, timeout, progress, ranged)
+                       for part, (start, end) in zip(parts, bounds)]
+            for fut in futures:
+                fut.result()
+
+    # Склейка на месте: первая часть становится архивом, остальные дописываются в неё
+    # и сразу удаляются — на диске одновременно лежит не больше архива и одной части.
+    # Если склейку прервать, недостающие части просто скачаются заново.
+    digest = hashlib.sha256()
+    tmp_dest = Path(f"{dest}.tmp")
+    os.replace(parts[0], tmp_dest)
+    with open(tmp_dest, "rb") as src:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    with open(tmp_dest, "ab") as out:
+        for part in parts[1:]:
+            with open(part, "rb") as src:
                 while True:
-                    chunk = resp.read(8192)
+                    chunk = src.read(CHUNK_SIZE)
                     if not chunk:
                         break
+                    digest.update(chunk)
                     out.write(chunk)
-                    pbar.update(len(chunk))
+            out.flush()
+            part.unlink()
+
+    size = tmp_dest.stat().st_size
+    if total is not None and size != total:
+        tmp_dest.unlink(missing_ok=True)
+        raise IOError(f"Size mismatch: expected {total}, got {size}")
+    if expected_sha256 and digest.hexdigest().lower() != expected_sha256.lower():
+        tmp_dest.unlink(missing_ok=True)
+        raise IOError(f"SHA-256 mismatch for {url}: got {digest.hexdigest()}")
 
+    os.replace(tmp_dest, dest)
+
+
+def _archive_name(url: str) -> str:
+    return Path(urllib.parse.urlparse(url).path).name or "model.zip"
+
+
+def _read_token(path: Path) -> str | None:
+    try:
+        return path.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+
+
+def _shared_now(directory: Path, tag: str) -> float:
+    """
+    Текущее время по часам файловой системы directory: mtime только что созданного файла.
+    На общем диске mtime ставит сервер, поэтому сравнение с mtime блокировки не зависит
+    от расхождения часов между машинами.
+    """
+    probe = directory / f".{tag}.now"
+    probe.write_bytes(b"")
+    try:
+        return probe.stat().st_mtime
+    finally:
+        probe.unlink(missing_ok=True)
+
+
+def _remove_lock(lock_path: Path, token: str, tag: str) -> bool:
+    """
+    Удаляет lock-файл, только если в нём записан token.
+    Файл сначала атомарно переименовывается в уникальное имя — из нескольких процессов
+    это удаётся только одному; если оказалось, что забрана чужая блокировка, она возвращается на место.
+    """
+    grabbed = lock_path.parent / f".{tag}.old"
+    try:
+        os.rename(lock_path, grabbed)
+    except FileNotFoundError:
+        return False
+    try:
+        if _read_token(grabbed) == token:
+            return True
+        try:
+            os.link(grabbed, lock_path)
+        except FileExistsError:
+            logger.warning("Lock %s was replaced while being checked", lock_path)
+        return False
+    finally:
+        grabbed.unlink(missing_ok=True)
+
+
+@contextmanager
+def _cache_lock(lock_path: Path, stale_after: float = 120.0, poll: float = 5.0):
+    """
+    Эксклюзивная блокировка через lock-файл, работающая и на общем диске.
+    Файл с уникальным токеном (host:pid:uuid) создаётся атомарно через os.link.
+    Пока блокировка удерживается, mtime файла обновляется; файл, не обновлявшийся
+    дольше stale_after секунд (по часам той же файловой системы), считается брошенным
+    упавшим процессом, и его забирает ровно один из ожидающих.
+    При выходе удаляется только собственная блокировка.
+    """
+    tag = f"{lock_path.name}.{uuid.uuid4().hex}"
+    token = f"{socket.gethostname()}:{os.getpid()}:{tag}"
+    staging = lock_path.parent / f".{tag}.new"
+    staging.write_text(token + "\n", encoding="utf-8")
+    try:
+        while True:
+            try:
+                os.link(staging, lock_path)
+                break
+            except FileExistsError:
+                pass
+            holder = _read_token(lock_path)
+            try:
+                age = _shared_now(lock_path.parent, tag) - lock_path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            # Возраст относится к блокировке holder, только если её не заменили во время замера
+            if holder is None or _read_token(lock_path) != holder:
+                continue
+            if age > stale_after:
+                if _remove_lock(lock_path, holder, tag):
+                    logger.warning("Removed stale lock %s held by %s (%.0f s old)", lock_path, holder, age)
+                continue
+            logger.info("Waiting for another download to finish (%s, held by %s)", lock_path, holder)
+            time.sleep(poll)
+    finally:
+        staging.unlink(missing_ok=True)
+
+    stop = threading.Event()
+
+    def heartbeat() -> None:
+        while not stop.wait(stale_after / 4):
+            if _read_token(lock_path) != token:
+                logger.warning("Lock %s was taken over by another process", lock_path)
+                return
+            try:
+                os.utime(lock_path)
+            except OSError as e:
+                logger.warning("Failed to refresh lock %s: %s", lock_path, e)
+
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        beat.join()
+        if not _remove_lock(lock_path, token, tag):
+            logger.warning("Lock %s is no longer ours; leaving it in place", lock_path)
+
+
+def _cached_archive(cache_dir: Path, name: str, expected_sha256: str | None) -> Path | None:
+    cached = cache_dir / name
+    if not cached.exists():
+        return None
+    if not expected_sha256 or sha256_file(cached).lower() == expected_sha256.lower():
+        logger.info("Using cached archive %s", cached)
+        return cached
+    logger.warning("Cached archive %s failed checksum; downloading again", cached)
+    return None
+
+
+def fetch_archive(url: str, work_dir: Path, cache_dir: Path | None = None, connections: int = 4,
+                  timeout: int = 30, expected_sha256: str | None = None) -> Path:
+    """
+    Возвращает путь к архиву, скачивая его только если его нет в кеше.
+    cache_dir — общий каталог-зеркало (например, сетевой диск): готовый архив
+    публикуется туда атомарно, и остальные машины берут его оттуда.
+    Скачивание идёт под блокировкой в cache_dir: машины, стартовавшие одновременно,
+    ждут первую и затем берут архив из кеша.
+    """
+    name = _archive_name(url)
+    if cache_dir is None:
+        return _download_archive(url, work_dir, name, None, connections, timeout, expected_sha256)
+
+    cached = _cached_archive(cache_dir, name, expected_sha256)
+    if cached is not None:
+        return cached
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        logger.warning("Cache directory %s unavailable (%s); downloading without cache", cache_dir, e)
+        return _download_archive(url, work_dir, name, None, connections, timeout, expected_sha256)
+    with _cache_lock(cache_dir / f".{name}.lock"):
+        # Пока ждали блокировку, архив мог скачать кто-то другой
+        cached = _cached_archive(cache_dir, name, expected_sha256)
+        if cached is not None:
+            return cached
+        return _download_archive(url, work_dir, name, cache_dir, connections, timeout, expected_sha256)
+
+
+def _download_archive(url: str, work_dir: Path, name: str, cache_dir: Path | None, connections: int,
+                      timeout: int, expected_sha256: str | None) -> Path:
+    work_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = work_dir / name
+    download_file(url, archive_path, connections=connections, timeout=timeout, expected_sha256=expected_sha256)
+
+    if cache_dir is not None:
+        try:
+            if os.stat(cache_dir).st_dev == os.stat(work_dir).st_dev:
+                # Та же файловая система — публикуем переименованием, без второй копии
+                os.replace(archive_path, cache_dir / name)
+            else:
+                # Копируем во временный файл и переименовываем, чтобы другие не увидели недописанный архив
+                tmp_cached = cache_dir / f".{name}.{os.getpid()}.tmp"
+                shutil.copyfile(archive_path, tmp_cached)
+                os.replace(tmp_cached, cache_dir / name)
+                archive_path.unlink(missing_ok=True)
+            logger.info("Archive stored in cache %s", cache_dir)
+            return cache_dir / name
+        except OSError as e:
+            logger.warning("Failed to store archive in cache %s: %s", cache_dir, e)
+    return archive_path
+
+
+def download_and_extract_zip(url: str, dest_dir: Path, expected_subdir_name: str | None = None, timeout: int = 30,
+                             *, expected_sha256: str | None = None, cache_dir: Path | None = None,
+                             connections: int = 4) -> bool:
+    """
+    Скачивает zip (с докачкой и параллельными частями), распаковывает и атомарно перемещает в dest_dir.
+    Если expected_subdir_name указан — проверяет, что распаковка содержит такую папку.
+    Недокачанные части хранятся в dest_dir.parent/.download и переживают перезапуск.
+    Показ прогресса скачивания и распаковки через tqdm.
+    """
+    from tqdm import tqdm
+
+    dest_dir = dest_dir.resolve()
+    work_dir = dest_dir.parent / ".download"
+    tmp_dir = None
+
+    try:
+        archive_path = fetch_archive(url, work_dir, cache_dir=cache_dir, connections=connections,
+                                     timeout=timeout, expected_sha256=expected_sha256)
+
+        # Распаковываем рядом с dest_dir, чтобы финальное перемещение было переименованием
+        tmp_dir = Path(tempfile.mkdtemp(prefix="av_editor_", dir=dest_dir.parent))
         logger.info("Extracting archive to %s", tmp_dir)
         with zipfile.ZipFile(archive_path, "r") as zf:
             members = zf.infolist()
             # Безопасная распаковка с прогрессом (избегаем zip-slip)
-            with tqdm(total=len(members), desc='Extracting', unit='file', leave=True) as pbar:
+            with tqdm(total=sum(m.file_size for m in members), desc='Extracting', unit='B',
+                      unit_scale=True, leave=True) as pbar:
                 for member in members:
                     member_path = tmp_dir / member.filename
                     resolved_target = member_path.resolve()
@@ -52,8 +374,8 @@ def download_and_extract_zip(url: str, dest_dir: Path, expected_subdir_name: str
                     else:
                         member_path.parent.mkdir(parents=True, exist_ok=True)
                         with zf.open(member) as source, open(member_path, "wb") as target:
-                            shutil.copyfileobj(source, target)
-                    pbar.update(1)
+                            shutil.copyfileobj(source, target, CHUNK_SIZE)
+                    pbar.update(member.file_size)
 
         # Найдем директорию с моделью
         if expected_subdir_name:
@@ -76,19 +398,31 @@ def download_and_extract_zip(url: str, dest_dir: Path, expected_subdir_name: str
             shutil.rmtree(dest_dir)
         shutil.move(str(model_src), str(dest_dir))
         logger.info("Model installed to %s", dest_dir)
+
+        # Архив вне кеша больше не нужен
+        if archive_path.parent == work_dir:
+            archive_path.unlink(missing_ok=True)
         return True
 
     except Exception as e:
         logger.error("Failed to download or extract model: %s", e)
         return False
     finally:
+        if tmp_dir is not None:
+            try:
+                shutil.rmtree(tmp_dir)
+            except Exception:
+                pass
+        # Пустой рабочий каталог не оставляем; недокачанные части остаются для докачки
         try:
-            shutil.rmtree(tmp_dir)
-        except Exception:
+            work_dir.rmdir()
+        except OSError:
             pass
 
 
-def ensure_vosk_model(model_dir: Path, url: str, expected_name: str | None = None) -> bool:
+def ensure_vosk_model(model_dir: Path, url: str, expected_name: str | None = None, *,
+                      expected_sha256: str | None = None, cache_dir: Path | None = None,
+                      connections: int = 4) -> bool:
     """Проверяет и при необходимости скачивает Vosk модель."""
     model_dir = model_dir.resolve()
     if model_dir.exists() and any(model_dir.iterdir()):
@@ -97,4 +431,6 @@ def ensure_vosk_model(model_dir: Path, url: str, expected_name: str | None = Non
 
     logger.info("Vosk model not found at %s; attempting download", model_dir)
     model_dir.parent.mkdir(parents=True, exist_ok=True)
-    return download_and_extract_zip(url, model_dir, expected_subdir_name=expected_name)
+    return download_and_extract_zip(url, model_dir, expected_subdir_name=expected_name,
+                                    expected_sha256=expected_sha256, cache_dir=cache_dir,
+                                    connections=connections)
@@ -6,7 +6,7 @@
 import sys
 import logging
 from pathlib import Path
-from config import VOSK_MODEL_URL, MODEL_DIR
+from config import VOSK_MODEL_URL, MODEL_DIR, VOSK_MODEL_SHA256, MODEL_CACHE_DIR, DOWNLOAD_CONNECTIONS
 
 
 logger = logging.getLogger(__name__)
@@ -44,7 +44,10 @@ def setup_project() -> bool:
 
     # 2. Загрузка и установка Vosk модели
     logger.info("Installing Vosk speech recognition model...")
-    if not ensure_vosk_model(model_dir, vosk_url, expected_name="vosk-model-ru"):
+    cache_dir = Path(MODEL_CACHE_DIR) if MODEL_CACHE_DIR else None
+    if not ensure_vosk_model(model_dir, vosk_url, expected_name="vosk-model-ru",
+                             expected_sha256=VOSK_MODEL_SHA256, cache_dir=cache_dir,
+                             connections=DOWNLOAD_CONNECTIONS):
         logger.error("Failed to install Vosk model")
         return False
     logger.info("✓ Vosk model installed successfully")